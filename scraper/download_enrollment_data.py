@@ -4,11 +4,18 @@ Download enrollment data (effectifs) for all school types
 Provides actual student counts and number of classes
 """
 
+import os
 import requests
-import json
+import requests_cache
+import orjson
+import random
 import time
+from concurrent.futures import ThreadPoolExecutor
+from itertools import chain
 from pathlib import Path
 
+from tqdm import tqdm
+
 # API base URL
 BASE_URL = "https://data.education.gouv.fr/api/v2/catalog/datasets"
 
@@ -40,182 +47,250 @@ NEW_DEPARTMENTS = [
     ('HAUTE-VIENNE', '87')
 ]
 
+# Only school years from this rentrée onwards are downloaded: we keep the
+# most recent year per school anyway, so older rows are pure download waste
+MIN_RENTREE = '2021'
+
 # Output directory
 DATA_DIR = Path(__file__).parent.parent / "data"
 DATA_DIR.mkdir(exist_ok=True)
 
+# Single session shared by all paginated calls: keep-alive reuses the
+# same TCP/TLS connection instead of re-handshaking once per page.
+# Responses are cached to disk for a day and revalidated with
+# ETag/If-Modified-Since, so re-runs within that window skip the
+# transfers entirely (delete the sqlite file to force a full refresh).
+SESSION = requests_cache.CachedSession(
+    str(DATA_DIR / "http_cache"),
+    backend='sqlite',
+    expire_after=86400,
+    cache_control=True
+)
+
 
 def load_or_create(filename):
     """Load existing JSON data or return empty list."""
     filepath = DATA_DIR / filename
     if filepath.exists():
-        with open(filepath, encoding='utf-8') as f:
-            return json.load(f)
+        return orjson.loads(filepath.read_bytes())
     return []
 
 
+# Column-factored output: field names written once as a header, records
+# as value rows. Every array record repeats the same ~30 field names, so
+# this cuts file size and parse time several fold. Opt-in via env var
+# while merge_datasets.py still reads the array format.
+KEYED_OUTPUT = os.environ.get('EFFECTIFS_KEYED_OUTPUT') == '1'
+
+
+def _record_fields(record):
+    """Fields dict of a record - nested API shape or already-flat (lycées)."""
+    return record.get('record', {}).get('fields', record)
+
+
+def save_keyed(filepath, records):
+    """Dump records as {"keys": [...], "rows": [[...], ...]}."""
+    keys = sorted({key for record in records for key in _record_fields(record)})
+    rows = [[_record_fields(record).get(key) for key in keys] for record in records]
+    with open(filepath, 'wb') as f:
+        f.write(orjson.dumps({'keys': keys, 'rows': rows}))
+
+
+def load_keyed(filepath):
+    """Inverse of save_keyed: rebuild flat field dicts from keys + rows."""
+    data = orjson.loads(Path(filepath).read_bytes())
+    keys = data['keys']
+    return [dict(zip(keys, row)) for row in data['rows']]
+
+
 def save_and_merge(filename, new_records, key_field):
     """Merge new records with existing data by key field, then save."""
     existing_records = load_or_create(filename)
 
-    # Index existing by key (extract from nested structure)
-    existing_by_key = {}
-    for record in existing_records:
-        fields = record.get('record', {}).get('fields', {})
-        key = fields.get(key_field)
-        if key:
-            existing_by_key[key] = record
+    # Nothing to merge in (e.g. a download failed and returned []):
+    # the existing data is already deduplicated on disk, so rebuilding
+    # the index and re-serializing would be pure waste
+    if not new_records:
+        return existing_records
 
-    # Merge new records (overwrites existing with same key)
-    for record in new_records:
+    # Single dedup pass: existing records first, new records after so
+    # they overwrite existing entries with the same key
+    existing_by_key = {}
+    for record in chain(existing_records, new_records):
         fields = record.get('record', {}).get('fields', {})
         key = fields.get(key_field)
         if key:
             existing_by_key[key] = record
 
-    # Save combined
+    # Save combined (compact orjson - indent=2 doubled both the bytes
+    # written and the serialization time for script-only files)
     combined = list(existing_by_key.values())
     filepath = DATA_DIR / filename
-    with open(filepath, 'w', encoding='utf-8') as f:
-        json.dump(combined, f, ensure_ascii=False, indent=2)
+    with open(filepath, 'wb') as f:
+        f.write(orjson.dumps(combined))
 
-    return combined
+    # NDJSON mirror: one record per line, so downstream consumers can
+    # stream record-by-record instead of parsing one big array
+    with open(filepath.with_suffix('.jsonl'), 'wb') as f:
+        for record in combined:
+            f.write(orjson.dumps(record))
+            f.write(b"\n")
 
+    if KEYED_OUTPUT:
+        save_keyed(filepath.with_suffix('.keyed.json'), combined)
 
-def fetch_paginated_data(dataset_id, filters=None, limit=100):
-    """
-    Fetch all records from a dataset with pagination
-    """
-    print(f"\nFetching data from {dataset_id}...")
-
-    url = f"{BASE_URL}/{dataset_id}/records"
-    all_records = []
-    offset = 0
-
-    while True:
-        params = {
-            'limit': limit,
-            'offset': offset
-        }
-
-        if filters:
-            params['where'] = filters
-
-        try:
-            response = requests.get(url, params=params, timeout=30)
-            response.raise_for_status()
-            data = response.json()
-
-            records = data.get('records', [])
-            if not records:
-                break
-
-            all_records.extend(records)
-            print(f"  Fetched {len(all_records)} records...", end='\r')
+    return combined
 
-            # Check if we got all records
-            total_count = data.get('total_count', 0)
-            if len(all_records) >= total_count:
-                break
 
-            offset += limit
-            time.sleep(0.3)  # Be respectful of API
+# Max concurrent page requests (be respectful of API)
+MAX_PARALLEL_PAGES = 5
 
-        except requests.exceptions.RequestException as e:
-            print(f"\n❌ Error fetching data: {e}")
-            break
 
-    print(f"\n✓ Fetched {len(all_records)} total records")
-    return all_records
+def _in_filter(field, values):
+    """Compact ODS where clause: field IN ('v1', 'v2', ...)"""
+    quoted = ", ".join(f"'{value}'" for value in values)
+    return f"{field} IN ({quoted})"
 
 
-def download_ecoles_effectifs():
+def _keep_latest_page(best, records, uai_field):
     """
-    Download enrollment data for primary schools (écoles) - NEW regions only
-    Includes total students and number of classes!
+    Fold one page of records into best (uai -> (rentree, record)),
+    keeping only the most recent school year per school.
     """
-    print("\n" + "="*80)
-    print("1. DOWNLOADING ÉCOLES ENROLLMENT DATA")
-    print("="*80)
-
-    # Filter by NEW department names only (Charente-Maritime)
-    new_dept_names = [name for name, code in NEW_DEPARTMENTS]
-    print(f"\n→ Downloading enrollment for: {', '.join(new_dept_names)}...")
-    dept_filter = " OR ".join([f"departement='{dept}'" for dept in new_dept_names])
-    records = fetch_paginated_data("fr-en-ecoles-effectifs-nb_classes", filters=dept_filter)
-
-    # Keep most recent year per school
-    school_records = {}
     for record in records:
         fields = record.get('record', {}).get('fields', {})
-        uai = fields.get('numero_ecole')
-        rentree = fields.get('rentree_scolaire', '')
+        uai = fields.get(uai_field)
+        if not uai:
+            continue
+        rentree = fields.get('rentree_scolaire', '') or ''
+        current = best.get(uai)
+        if current is None or rentree > current[0]:
+            best[uai] = (rentree, record)
 
-        if uai:
-            if uai not in school_records or rentree > school_records[uai].get('record', {}).get('fields', {}).get('rentree_scolaire', ''):
-                school_records[uai] = record
 
-    latest_records = list(school_records.values())
-    print(f"\n✓ Filtered to {len(latest_records)} schools (most recent year)")
+# Retry policy for transient failures (connection resets, 429/5xx)
+MAX_RETRIES = 3
+RETRY_BASE_DELAY = 1.0  # seconds, doubled per attempt with jitter
 
-    # Merge with existing and save
-    combined = save_and_merge("effectifs_ecoles_pays_loire.json", latest_records, key_field='numero_ecole')
-    print(f"✓ Total écoles enrollment across all regions: {len(combined)}")
-    print(f"✓ Saved to {DATA_DIR / 'effectifs_ecoles_pays_loire.json'}")
-    return combined
+# HTTP statuses worth retrying - anything else fails fast
+TRANSIENT_STATUSES = {429, 500, 502, 503, 504}
 
 
-def download_colleges_effectifs():
-    """
-    Download enrollment data for collèges - NEW regions only
-    """
-    print("\n" + "="*80)
-    print("2. DOWNLOADING COLLÈGES ENROLLMENT DATA")
-    print("="*80)
+def _get_with_retry(url, params):
+    """GET with exponential backoff + jitter on transient failures"""
+    delay = RETRY_BASE_DELAY
+    for attempt in range(MAX_RETRIES + 1):
+        try:
+            response = SESSION.get(url, params=params, timeout=30)
+            if response.status_code in TRANSIENT_STATUSES and attempt < MAX_RETRIES:
+                raise requests.exceptions.HTTPError(f"transient status {response.status_code}")
+            response.raise_for_status()
+            return response
+        except requests.exceptions.RequestException:
+            if attempt == MAX_RETRIES:
+                raise
+            # Full jitter keeps the parallel page workers from retrying in
+            # lockstep and hammering the API at the same instant
+            time.sleep(delay * (0.5 + random.random()))
+            delay *= 2
 
-    # Filter by NEW department codes only (Charente-Maritime)
-    new_dept_codes = [code for name, code in NEW_DEPARTMENTS]
-    print(f"\n→ Downloading enrollment for departments: {', '.join(new_dept_codes)}...")
-    dept_filter = " OR ".join([f"code_dept='{code}'" for code in new_dept_codes])
-    records = fetch_paginated_data("fr-en-college-effectifs-niveau-sexe-lv", filters=dept_filter)
 
-    # Keep most recent year per school
-    school_records = {}
-    for record in records:
-        fields = record.get('record', {}).get('fields', {})
-        uai = fields.get('numero_college')
-        rentree = fields.get('rentree_scolaire', '')
+def _fetch_page(url, params):
+    """Fetch one page of records"""
+    response = _get_with_retry(url, params)
+    # orjson parses the raw bytes directly - no intermediate text decode
+    return orjson.loads(response.content).get('records', [])
 
-        if uai:
-            if uai not in school_records or rentree > school_records[uai].get('record', {}).get('fields', {}).get('rentree_scolaire', ''):
-                school_records[uai] = record
 
-    latest_records = list(school_records.values())
-    print(f"\n✓ Filtered to {len(latest_records)} collèges (most recent year)")
+def fetch_paginated_data(dataset_id, filters=None, select=None, limit=100, page_handler=None):
+    """
+    Fetch all records from a dataset with pagination.
+
+    select, if given, is a comma-separated field list forwarded to the
+    API so rows come back projected to just those fields - the effectifs
+    datasets are dozens of per-niveau/sexe columns wide and we read a
+    handful, so this cuts transfer and parse cost drastically.
+
+    The first page returns total_count, so the remaining offsets are known
+    upfront and fetched by a bounded thread pool instead of a serial
+    offset loop with a sleep between pages.
+
+    limit=100 is the maximum page size the ODS v2 records API accepts
+    (larger values are clamped server-side), so fewer round-trips can only
+    come from tighter where clauses, not bigger pages.
+
+    page_handler, if given, consumes each page as it lands (while later
+    pages are still in flight) and nothing is accumulated - the function
+    then returns the number of records fetched instead of a list. This
+    lets callers reduce pages straight into their per-school dicts without
+    materializing the full record list.
+    """
+    print(f"\nFetching data from {dataset_id}...")
 
-    # Merge with existing and save
-    combined = save_and_merge("effectifs_colleges_pays_loire.json", latest_records, key_field='numero_college')
-    print(f"✓ Total collèges enrollment across all regions: {len(combined)}")
-    print(f"✓ Saved to {DATA_DIR / 'effectifs_colleges_pays_loire.json'}")
-    return combined
+    url = f"{BASE_URL}/{dataset_id}/records"
 
+    base_params = {'limit': limit}
+    if filters:
+        base_params['where'] = filters
+    if select:
+        base_params['select'] = select
 
-def download_lycees_effectifs():
+    all_records = []
+    fetched = 0
+    pbar = None
+
+    try:
+        # First page tells us the total count
+        response = _get_with_retry(url, {**base_params, 'offset': 0})
+        data = orjson.loads(response.content)
+
+        first_page = data.get('records', [])
+        total_count = data.get('total_count', 0)
+        fetched = len(first_page)
+
+        # tqdm rate-limits its own redraws, so progress costs one
+        # update() call per page instead of a stdout flush per page
+        pbar = tqdm(total=total_count, desc=dataset_id, unit='rec')
+        pbar.update(fetched)
+
+        if page_handler:
+            page_handler(first_page)
+        else:
+            all_records = first_page
+
+        # Remaining offsets are independent - fetch them in parallel
+        if total_count > fetched > 0:
+            offsets = range(limit, total_count, limit)
+            with ThreadPoolExecutor(max_workers=MAX_PARALLEL_PAGES) as executor:
+                pages = executor.map(
+                    lambda offset: _fetch_page(url, {**base_params, 'offset': offset}),
+                    offsets
+                )
+                for page_records in pages:
+                    fetched += len(page_records)
+                    pbar.update(len(page_records))
+                    if page_handler:
+                        page_handler(page_records)
+                    else:
+                        all_records.extend(page_records)
+
+    except requests.exceptions.RequestException as e:
+        print(f"\n❌ Error fetching data: {e}")
+        return fetched if page_handler else []
+    finally:
+        if pbar is not None:
+            pbar.close()
+
+    print(f"✓ Fetched {fetched} total records")
+    return fetched if page_handler else all_records
+
+
+def _reduce_lycee_page(best, records):
     """
-    Download enrollment data for lycées (general only) - NEW regions only
+    Fold one page of lycée rows into best (uai -> summary dict), keeping
+    the most recent year. Lycées are saved flattened to the handful of
+    fields we use, unlike écoles/collèges which keep the raw API record.
     """
-    print("\n" + "="*80)
-    print("3. DOWNLOADING LYCÉES ENROLLMENT DATA")
-    print("="*80)
-
-    # Filter by NEW department codes only (Charente-Maritime)
-    new_dept_codes = [code for name, code in NEW_DEPARTMENTS]
-    print(f"\n→ Downloading enrollment for departments: {', '.join(new_dept_codes)}...")
-    dept_filter = " OR ".join([f"code_departement_pays='{code}'" for code in new_dept_codes])
-    records = fetch_paginated_data("fr-en-lycee_gt-effectifs-niveau-sexe-lv", filters=dept_filter)
-
-    # Keep only most recent year per school (data already aggregated by year)
-    school_data = {}
     for record in records:
         fields = record.get('record', {}).get('fields', {})
         uai = fields.get('numero_lycee')
@@ -224,22 +299,91 @@ def download_lycees_effectifs():
         if not uai:
             continue
 
-        # Keep most recent year only
-        if uai not in school_data or rentree > school_data[uai]['rentree']:
-            school_data[uai] = {
+        if uai not in best or rentree > best[uai]['rentree']:
+            best[uai] = {
                 'uai': uai,
                 'name': fields.get('denomination_principale', ''),
                 'rentree': rentree,
                 'total_students': fields.get('nombre_d_eleves', 0) or 0
             }
 
-    aggregated_records = list(school_data.values())
-    print(f"\n✓ Filtered to {len(aggregated_records)} lycées (most recent year)")
+
+# The three school types differ only in dataset id, department filter
+# field (names vs 2-digit codes), UAI field and output file - one driver
+# below handles all of them
+EFFECTIFS_DATASETS = [
+    {
+        'title': "1. DOWNLOADING ÉCOLES ENROLLMENT DATA",
+        'noun': 'écoles',
+        'dataset_id': "fr-en-ecoles-effectifs-nb_classes",
+        'dept_field': 'departement',
+        'dept_names': True,  # this dataset filters on uppercase names
+        'uai_field': 'numero_ecole',
+        'filename': "effectifs_ecoles_pays_loire.json",
+        # Exactly the fields merge_datasets.py reads for primary schools
+        'select': "numero_ecole,rentree_scolaire,nombre_total_eleves,nombre_total_classes",
+    },
+    {
+        'title': "2. DOWNLOADING COLLÈGES ENROLLMENT DATA",
+        'noun': 'collèges',
+        'dataset_id': "fr-en-college-effectifs-niveau-sexe-lv",
+        'dept_field': 'code_dept',
+        'dept_names': False,
+        'uai_field': 'numero_college',
+        'filename': "effectifs_colleges_pays_loire.json",
+        'select': "numero_college,rentree_scolaire,nombre_eleves_total",
+    },
+    {
+        'title': "3. DOWNLOADING LYCÉES ENROLLMENT DATA",
+        'noun': 'lycées',
+        'dataset_id': "fr-en-lycee_gt-effectifs-niveau-sexe-lv",
+        'dept_field': 'code_departement_pays',
+        'dept_names': False,
+        'uai_field': 'uai',
+        'filename': "effectifs_lycees_pays_loire.json",
+        'select': "numero_lycee,rentree_scolaire,denomination_principale,nombre_d_eleves",
+        'reduce_page': _reduce_lycee_page,  # flattened summary records
+    },
+]
+
+
+def download_effectifs(config):
+    """
+    Download enrollment data for one school type (NEW regions only),
+    driven by its EFFECTIFS_DATASETS entry.
+    """
+    print("\n" + "="*80)
+    print(config['title'])
+    print("="*80)
+
+    # Filter by NEW departments only
+    if config['dept_names']:
+        dept_values = [name for name, code in NEW_DEPARTMENTS]
+    else:
+        dept_values = [code for name, code in NEW_DEPARTMENTS]
+    print(f"\n→ Downloading enrollment for: {', '.join(dept_values)}...")
+    dept_filter = f"{_in_filter(config['dept_field'], dept_values)} AND rentree_scolaire >= '{MIN_RENTREE}'"
+
+    # Keep most recent year per school, reduced page by page as pages land
+    reduce_page = config.get('reduce_page')
+    best = {}
+    if reduce_page:
+        handler = lambda records: reduce_page(best, records)
+    else:
+        handler = lambda records: _keep_latest_page(best, records, config['uai_field'])
+    fetch_paginated_data(config['dataset_id'], filters=dept_filter,
+                         select=config.get('select'), page_handler=handler)
+
+    if reduce_page:
+        latest_records = list(best.values())
+    else:
+        latest_records = [record for _, record in best.values()]
+    print(f"\n✓ Filtered to {len(latest_records)} {config['noun']} (most recent year)")
 
     # Merge with existing and save
-    combined = save_and_merge("effectifs_lycees_pays_loire.json", aggregated_records, key_field='uai')
-    print(f"✓ Total lycées enrollment across all regions: {len(combined)}")
-    print(f"✓ Saved to {DATA_DIR / 'effectifs_lycees_pays_loire.json'}")
+    combined = save_and_merge(config['filename'], latest_records, key_field=config['uai_field'])
+    print(f"✓ Total {config['noun']} enrollment across all regions: {len(combined)}")
+    print(f"✓ Saved to {DATA_DIR / config['filename']}")
     return combined
 
 
@@ -252,9 +396,7 @@ def main():
     print("New region: Nouvelle-Aquitaine (Charente-Maritime)")
     print("="*80)
 
-    ecoles = download_ecoles_effectifs()
-    colleges = download_colleges_effectifs()
-    lycees = download_lycees_effectifs()
+    ecoles, colleges, lycees = [download_effectifs(config) for config in EFFECTIFS_DATASETS]
 
     print("\n" + "="*80)
     print("DOWNLOAD & MERGE COMPLETE")
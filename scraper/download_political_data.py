@@ -12,13 +12,27 @@ Downloads:
 Outputs merged political_data.json keyed by INSEE commune code
 """
 
-import json
+import asyncio
+import hashlib
+import os
 import time
 import requests
 import csv
 import io
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from functools import lru_cache
+from itertools import chain
 from pathlib import Path
-from collections import defaultdict
+from urllib.parse import quote
+
+import aiohttp
+import orjson
+import pandas as pd
+from tqdm import tqdm
 
 # Configuration
 CACHE_DIR = Path(__file__).parent.parent / "data" / "political_cache"
@@ -30,10 +44,81 @@ DEPARTMENTS = [
     "44", "49", "53", "72", "85",  # Pays de la Loire
     "16", "17", "19", "23", "24", "33", "40", "47", "64", "79", "86", "87"  # Nouvelle-Aquitaine
 ]
+# Frozen set view for the per-row membership checks in the CSV loaders
+# (DEPARTMENTS stays a list - its order is part of the public contract)
+DEPARTMENT_SET = frozenset(DEPARTMENTS)
 
 # Rate limiting
 REQUEST_DELAY = 0.022  # seconds between requests (~45 req/sec, within 50 req/sec limit)
 
+# On-disk HTTP cache: re-runs (e.g. while debugging the merge step) reuse
+# the downloaded election files instead of re-fetching identical bytes
+HTTP_CACHE_DIR = CACHE_DIR / "http"
+HTTP_CACHE_DIR.mkdir(exist_ok=True)
+HTTP_CACHE_TTL = 7 * 86400  # seconds
+
+# One session for all file downloads: keep-alive reuses connections
+# across the loaders (which run in parallel threads) and the mounted
+# adapter retries transient failures with backoff instead of dying on
+# the first 5xx. The geo API lookups use their own aiohttp session.
+SESSION = requests.Session()
+SESSION.mount('https://', HTTPAdapter(
+    pool_connections=8,
+    pool_maxsize=8,
+    max_retries=Retry(
+        total=5,
+        backoff_factor=0.5,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=frozenset(['GET'])
+    )
+))
+
+
+def cached_get(url, timeout=120):
+    """
+    GET url and return the path of its cached body under
+    CACHE_DIR/http/<sha256(url)>. Entries younger than HTTP_CACHE_TTL are
+    served from disk without touching the network; older entries are
+    revalidated with If-None-Match / If-Modified-Since, so an unchanged
+    file costs one 304 round-trip instead of a re-download. Downloads
+    stream to disk in chunks, so even the RNE export never sits in
+    memory whole.
+    """
+    key = hashlib.sha256(url.encode()).hexdigest()
+    cache_file = HTTP_CACHE_DIR / key
+    meta_file = cache_file.with_suffix('.meta')
+    if cache_file.exists() and time.time() - cache_file.stat().st_mtime < HTTP_CACHE_TTL:
+        return cache_file
+
+    # Expired entry: offer the stored validators so the server can
+    # answer 304 Not Modified instead of resending the body
+    request_headers = {}
+    if cache_file.exists() and meta_file.exists():
+        meta = orjson.loads(meta_file.read_bytes())
+        if meta.get('etag'):
+            request_headers['If-None-Match'] = meta['etag']
+        if meta.get('last_modified'):
+            request_headers['If-Modified-Since'] = meta['last_modified']
+
+    tmp_file = cache_file.with_suffix('.tmp')
+    with SESSION.get(url, stream=True, timeout=timeout, headers=request_headers) as response:
+        if response.status_code == 304:
+            # Body unchanged server-side - refresh the TTL clock and keep it
+            os.utime(cache_file)
+            return cache_file
+        response.raise_for_status()
+        validators = {
+            'etag': response.headers.get('ETag'),
+            'last_modified': response.headers.get('Last-Modified'),
+        }
+        with open(tmp_file, 'wb') as f:
+            for block in response.iter_content(chunk_size=1 << 20):
+                f.write(block)
+    # Atomic rename - an interrupted download can't leave a torn entry
+    os.replace(tmp_file, cache_file)
+    meta_file.write_bytes(orjson.dumps(validators))
+    return cache_file
+
 # Party code to readable label mapping
 PARTY_LABELS = {
     # Left
@@ -71,6 +156,100 @@ PARTY_LABELS = {
 }
 
 
+@lru_cache(maxsize=None)
+def _party_label(party_code):
+    """Readable label for a party code (the code itself if unmapped)."""
+    return PARTY_LABELS.get(party_code, party_code) if party_code else None
+
+
+@dataclass(slots=True)
+class Commune:
+    """
+    One merged commune record. Slots avoid the per-instance dict that a
+    plain dict-of-dicts layout pays ~10k times over in the merge step;
+    orjson serializes dataclasses natively at dump time.
+    """
+    commune_name: str
+    insee_code: str
+    mayor: dict | None = None
+    municipal_2020: dict | None = None
+    presidential_2022: dict | None = None
+    legislative_2024: dict | None = None
+
+
+# Max concurrent geo.api.gouv.fr lookups (responses overlap; request
+# starts are still paced at REQUEST_DELAY by _pace below)
+MAX_CONCURRENT_LOOKUPS = 20
+
+
+async def _pace(lock):
+    """Space out request starts by REQUEST_DELAY to respect the rate limit."""
+    async with lock:
+        await asyncio.sleep(REQUEST_DELAY)
+
+
+async def _fetch_communes(session, semaphore, pace_lock, postal_code):
+    """Fetch the commune list for one postal code."""
+    async with semaphore:
+        await _pace(pace_lock)
+        async with session.get(
+            "https://geo.api.gouv.fr/communes",
+            # fields trims each commune to the two attributes _match_city
+            # reads, instead of the full default payload
+            params={'codePostal': postal_code, 'fields': 'nom,code'}
+        ) as response:
+            response.raise_for_status()
+            return await response.json()
+
+
+def _match_city(communes, city):
+    """
+    Resolve one city name against its postal code's commune list.
+
+    Returns (entry_or_None, status_message) - the entry is the
+    {'insee_code', 'commune_name'} dict stored in the mapping.
+    """
+    if isinstance(communes, Exception):
+        return None, f"✗ Error: {str(communes)}"
+
+    if not communes:
+        return None, "✗ No communes found"
+
+    if len(communes) == 1:
+        # Single commune for this postal code
+        commune = communes[0]
+        note = ""
+    else:
+        # Multiple communes - match by city name, first as fallback
+        commune = next((c for c in communes if c['nom'].lower() == city.lower()), None)
+        if commune is not None:
+            note = " [matched by name]"
+        else:
+            commune = communes[0]
+            note = f" [fallback, {len(communes)} options]"
+
+    entry = {
+        'insee_code': commune['code'],
+        'commune_name': commune['nom']
+    }
+    return entry, f"✓ {commune['code']} ({commune['nom']}){note}"
+
+
+async def _build_insee_mapping_async(postal_codes):
+    """Fetch every postal code's commune list concurrently."""
+    semaphore = asyncio.Semaphore(MAX_CONCURRENT_LOOKUPS)
+    pace_lock = asyncio.Lock()
+    async with aiohttp.ClientSession(
+        timeout=aiohttp.ClientTimeout(total=10),
+        connector=aiohttp.TCPConnector(limit=MAX_CONCURRENT_LOOKUPS)
+    ) as session:
+        results = await asyncio.gather(*[
+            _fetch_communes(session, semaphore, pace_lock, postal_code)
+            for postal_code in postal_codes
+        ], return_exceptions=True)
+    return dict(zip(postal_codes, results))
+
+
 def build_insee_mapping():
     """Build postal code → INSEE code mapping using geo.api.gouv.fr"""
     print("\n" + "="*80)
@@ -78,8 +257,7 @@ def build_insee_mapping():
     print("="*80)
 
     # Load schools to get all postal codes and cities
-    with open(SCHOOLS_FILE) as f:
-        schools = json.load(f)
+    schools = orjson.loads(SCHOOLS_FILE.read_bytes())
 
     print(f"Loaded {len(schools)} schools")
 
@@ -93,68 +271,47 @@ def build_insee_mapping():
 
     print(f"Found {len(locations)} unique postal code + city combinations")
 
+    # Resume from a previous (possibly partial) run: locations already
+    # in insee_mapping.json are kept as-is and never re-queried, so a
+    # network blip mid-run only costs the postal codes that were still
+    # unresolved when it hit.
+    output_file = CACHE_DIR / "insee_mapping.json"
     mapping = {}
+    if output_file.exists():
+        mapping = orjson.loads(output_file.read_bytes())
+        print(f"  (resuming: {len(mapping)} locations already mapped)")
+
+    pending = sorted(
+        (postal_code, city) for postal_code, city in locations
+        if f"{postal_code}|{city}" not in mapping
+    )
+
+    # The geo API is keyed on postal code only, so city-name variants
+    # sharing a postal code would issue identical requests. Fetch each
+    # postal code exactly once (concurrently - the lookups are entirely
+    # latency-bound) and resolve every city locally from that response.
+    postal_codes = sorted({postal_code for postal_code, _ in pending})
+    print(f"  ({len(postal_codes)} unique postal codes to query)")
+    communes_by_postal = {}
+    if postal_codes:
+        communes_by_postal = asyncio.run(_build_insee_mapping_async(postal_codes))
+
     success = 0
     failed = []
 
-    for postal_code, city in sorted(locations):
-        print(f"  Querying {postal_code} ({city})...", end=' ')
-
-        try:
-            url = f"https://geo.api.gouv.fr/communes?codePostal={postal_code}"
-            response = requests.get(url, timeout=10)
-            response.raise_for_status()
-
-            communes = response.json()
-
-            if len(communes) == 1:
-                # Single commune for this postal code
-                insee_code = communes[0]['code']
-                commune_name = communes[0]['nom']
-                mapping[f"{postal_code}|{city}"] = {
-                    'insee_code': insee_code,
-                    'commune_name': commune_name
-                }
-                print(f"✓ {insee_code} ({commune_name})")
-                success += 1
-            elif len(communes) > 1:
-                # Multiple communes - match by city name
-                matched = False
-                for commune in communes:
-                    if commune['nom'].lower() == city.lower():
-                        insee_code = commune['code']
-                        commune_name = commune['nom']
-                        mapping[f"{postal_code}|{city}"] = {
-                            'insee_code': insee_code,
-                            'commune_name': commune_name
-                        }
-                        print(f"✓ {insee_code} ({commune_name}) [matched by name]")
-                        success += 1
-                        matched = True
-                        break
-
-                if not matched:
-                    # Use first commune as fallback
-                    insee_code = communes[0]['code']
-                    commune_name = communes[0]['nom']
-                    mapping[f"{postal_code}|{city}"] = {
-                        'insee_code': insee_code,
-                        'commune_name': commune_name
-                    }
-                    print(f"⚠ {insee_code} ({commune_name}) [fallback, {len(communes)} options]")
-                    success += 1
-            else:
-                print("✗ No communes found")
-                failed.append(f"{postal_code}|{city}")
-
-            time.sleep(REQUEST_DELAY)
-
-        except Exception as e:
-            print(f"✗ Error: {str(e)}")
+    # tqdm rate-limits its own redraws; only failures get their own log
+    # line (the per-location success prints were hundreds of stdout
+    # flushes per run and pure noise in CI logs)
+    for postal_code, city in tqdm(pending, desc="INSEE lookup", unit="loc"):
+        entry, message = _match_city(communes_by_postal[postal_code], city)
+        if entry is not None:
+            mapping[f"{postal_code}|{city}"] = entry
+            success += 1
+        else:
+            tqdm.write(f"  {postal_code} ({city}): {message}")
             failed.append(f"{postal_code}|{city}")
-            time.sleep(REQUEST_DELAY)
 
-    print(f"\n✓ Successfully mapped {success}/{len(locations)} locations")
+    print(f"\n✓ Mapped {success} new locations ({len(mapping)}/{len(locations)} total)")
     if failed:
         print(f"✗ Failed to map {len(failed)} locations:")
         for loc in failed[:10]:
@@ -162,10 +319,8 @@ def build_insee_mapping():
         if len(failed) > 10:
             print(f"  ... and {len(failed) - 10} more")
 
-    # Save mapping
-    output_file = CACHE_DIR / "insee_mapping.json"
-    with open(output_file, 'w', encoding='utf-8') as f:
-        json.dump(mapping, f, indent=2, ensure_ascii=False)
+    # Save mapping (previous entries plus whatever this run resolved)
+    output_file.write_bytes(orjson.dumps(mapping))
 
     print(f"\n✓ Saved INSEE mapping to {output_file}")
     return mapping
@@ -179,63 +334,72 @@ def download_mayors():
 
     mayors = {}
 
-    # CSV export URL from Opendatasoft
-    csv_url = "https://public.opendatasoft.com/api/explore/v2.1/catalog/datasets/donnees-du-repertoire-national-des-elus/exports/csv/?delimiters=%3B&lang=en&timezone=UTC&use_labels=true"
-
-    print("Downloading full RNE CSV export...")
+    # CSV export URL from Opendatasoft. The where clause pushes the
+    # Maire + department filter server-side: the unfiltered export is
+    # hundreds of MB for all of France, of which we keep ~1500 rows.
+    # The client-side filter below still runs as a safety net.
+    dept_list = ", ".join(f'"{dept}"' for dept in DEPARTMENTS)
+    where_clause = quote(f'nom_de_la_fonction="Maire" AND code_du_departement IN ({dept_list})')
+    csv_url = (
+        "https://public.opendatasoft.com/api/explore/v2.1/catalog/datasets/"
+        "donnees-du-repertoire-national-des-elus/exports/csv/"
+        f"?delimiters=%3B&lang=en&timezone=UTC&use_labels=true&where={where_clause}"
+    )
+
+    print("Downloading filtered RNE CSV export...")
     print("  This may take a minute (large file)...")
 
     try:
-        response = requests.get(csv_url, timeout=300)
-        response.raise_for_status()
-        response.encoding = 'utf-8'
-
-        print("  ✓ Downloaded CSV, parsing...")
-
-        # Remove BOM if present at the start of the file
-        text_content = response.text
-        if text_content.startswith('\ufeff'):
-            text_content = text_content[1:]
-
-        # Parse CSV
-        reader = csv.DictReader(io.StringIO(text_content), delimiter=';')
-
-        total_processed = 0
-        mayors_found = 0
-        for row in reader:
-            total_processed += 1
-
-            # Filter for mayors only - EXACT match required
-            function_name = row.get('Nom de la fonction', '').strip()
-
-            # Check if this is a mayor (Maire) - EXACT match, not adjoint/deputy
-            if function_name != 'Maire':
-                continue
-
-            # Get commune code
-            com_code = row.get('Code de la commune', '').strip()
-            dept_code = row.get('Code du département', '').strip()
-
-            # Filter for our 5 departments (Pays de la Loire)
-            if dept_code in DEPARTMENTS and com_code:
+        # The export streams to the disk cache in chunks (never held in
+        # memory whole), then pandas' C tokenizer parses the cached file.
+        # usecols drops the dozens of RNE columns we never read at parse
+        # time, and utf-8-sig absorbs the BOM without copying anything.
+        csv_path = cached_get(csv_url, timeout=300)
+
+        print("  ✓ Downloaded (or cached), parsing with pandas...")
+
+        df = pd.read_csv(
+            csv_path,
+            sep=';',
+            encoding='utf-8-sig',
+            usecols=[
+                'Nom de la fonction',
+                'Code du département',
+                'Code de la commune',
+                'Prénom de l\'élu·e',
+                'Nom de l\'élu·e'
+            ],
+            dtype=str,
+            engine='c'
+        )
+
+        total_processed = len(df)
+
+        # Filter for mayors only (EXACT 'Maire', not adjoint/deputy) in
+        # our departments - vectorized instead of per-row dict lookups
+        df = df.fillna('')
+        df = df[
+            (df['Nom de la fonction'].str.strip() == 'Maire')
+            & df['Code du département'].str.strip().isin(DEPARTMENT_SET)
+        ]
+
+        for com_code, first_name, last_name in zip(
+            df['Code de la commune'].str.strip(),
+            df['Prénom de l\'élu·e'].str.strip(),
+            df['Nom de l\'élu·e'].str.strip()
+        ):
+            if com_code:
                 mayors[com_code] = {
-                    'first_name': row.get('Prénom de l\'élu·e', '').strip(),
-                    'last_name': row.get('Nom de l\'élu·e', '').strip(),
+                    'first_name': first_name,
+                    'last_name': last_name,
                     'party': None  # Will be filled from municipal_2020 data
                 }
-                mayors_found += 1
-
-            if total_processed % 50000 == 0:
-                print(f"  Processed {total_processed} records, found {mayors_found} Pays de la Loire mayors...")
 
         print(f"\n✓ Processed {total_processed} total records")
         print(f"✓ Found {len(mayors)} mayors from Pays de la Loire")
 
         # Show breakdown by department
-        by_dept = {}
-        for insee in mayors:
-            dept = insee[:2]
-            by_dept[dept] = by_dept.get(dept, 0) + 1
+        by_dept = Counter(insee[:2] for insee in mayors)
         print(f"  By department: {sorted(by_dept.items())}")
 
     except Exception as e:
@@ -243,8 +407,7 @@ def download_mayors():
 
     # Save mayors
     output_file = CACHE_DIR / "mayors.json"
-    with open(output_file, 'w', encoding='utf-8') as f:
-        json.dump(mayors, f, indent=2, ensure_ascii=False)
+    output_file.write_bytes(orjson.dumps(mayors))
 
     print(f"✓ Saved mayors data to {output_file}")
     return mayors
@@ -261,7 +424,8 @@ def download_municipal_2020():
     print("DOWNLOADING MUNICIPAL 2020 RESULTS")
     print("="*80)
 
-    municipal = {}
+    # Per-round winning lists, merged with explicit round priority below
+    winners = {1: {}, 2: {}}
 
     # Download both rounds, starting with Round 1 (will be overwritten by Round 2 if exists)
     # Round 1 uses TAB delimiter, Round 2 uses semicolon
@@ -289,29 +453,48 @@ def download_municipal_2020():
             print(f"Downloading {file_type} habitants...")
 
             try:
-                response = requests.get(url, timeout=60)
-                response.raise_for_status()
-                response.encoding = 'latin-1'  # French gov files use latin-1
+                # French gov files use latin-1
+                text = cached_get(url, timeout=60).read_text(encoding='latin-1')
+
+                # Parse CSV with round-specific delimiter. csv.reader
+                # plus a header index map skips the per-row dict that
+                # DictReader allocates - most of the parse cost on these
+                # wide files, where we read six columns
+                raw = csv.reader(io.StringIO(text), delimiter=round_config['delimiter'])
+                header = next(raw, [])
+                col = {name: i for i, name in enumerate(header)}
 
-                # Parse CSV with round-specific delimiter
-                reader = csv.DictReader(io.StringIO(response.text), delimiter=round_config['delimiter'])
+                try:
+                    dept_idx = col['Code du département']
+                    commune_idx = col['Code de la commune']
+                    liste_idx = col['Liste']
+                    nuance_idx = col['Code Nuance']
+                    voix_idx = col['Voix']
+                    exprimes_idx = col['Exprimés']
+                except KeyError as missing:
+                    print(f"  ✗ Missing column {missing} in {file_type} file")
+                    continue
+                max_idx = max(dept_idx, commune_idx, liste_idx,
+                              nuance_idx, voix_idx, exprimes_idx)
 
-                for row in reader:
-                    code_departement = row.get('Code du département', '').strip()
-                    code_commune = row.get('Code de la commune', '').strip()
+                for row in raw:
+                    if len(row) <= max_idx:
+                        continue
+
+                    code_departement = row[dept_idx].strip()
 
                     # Filter for Pays de la Loire departments
-                    if code_departement not in DEPARTMENTS:
+                    if code_departement not in DEPARTMENT_SET:
                         continue
 
                     # Build INSEE code (department + commune)
-                    insee_code = code_departement + code_commune
+                    insee_code = code_departement + row[commune_idx].strip()
 
                     # Extract winning list data (liste with highest % wins)
-                    liste = row.get('Liste', '').strip()
-                    code_nuance = row.get('Code Nuance', '').strip()
-                    voix = row.get('Voix', '').strip()
-                    exprimes = row.get('Exprimés', '').strip()
+                    liste = row[liste_idx].strip()
+                    code_nuance = row[nuance_idx].strip()
+                    voix = row[voix_idx].strip()
+                    exprimes = row[exprimes_idx].strip()
 
                     if voix and exprimes:
                         try:
@@ -320,36 +503,44 @@ def download_municipal_2020():
                             if total > 0:
                                 percentage = (votes / total) * 100
 
-                                # For each commune, keep highest percentage within the round
-                                # Round 2 will overwrite Round 1 if available
-                                if insee_code not in municipal or municipal[insee_code]['round'] <= round_num:
-                                    if insee_code not in municipal or percentage > municipal[insee_code].get('percentage', 0):
-                                        municipal[insee_code] = {
-                                            'year': 2020,
-                                            'round': round_num,
-                                            'winning_list': liste or 'Liste inconnue',
-                                            'percentage': round(percentage, 1),
-                                            'party': code_nuance or None
-                                        }
+                                # Keep the highest percentage within this
+                                # round; round priority is applied once,
+                                # after both rounds are parsed
+                                best = winners[round_num].get(insee_code)
+                                if best is None or percentage > best['percentage']:
+                                    winners[round_num][insee_code] = {
+                                        'year': 2020,
+                                        'round': round_num,
+                                        'winning_list': liste or 'Liste inconnue',
+                                        'percentage': round(percentage, 1),
+                                        'party': code_nuance or None
+                                    }
                         except ValueError:
                             pass  # Skip invalid numbers
 
-                print(f"  ✓ Processed {len(municipal)} communes so far")
+                print(f"  ✓ Processed {len(winners[round_num])} communes so far")
 
             except Exception as e:
                 print(f"  ✗ Error downloading {file_type}: {str(e)}")
 
-    # Count by round
-    round1_count = sum(1 for m in municipal.values() if m['round'] == 1)
-    round2_count = sum(1 for m in municipal.values() if m['round'] == 2)
+    # A round-2 result is the definitive one wherever it exists; round 1
+    # covers communes decided without a runoff
+    municipal = {**winners[1], **winners[2]}
+
+    # Count by round - one pass instead of one scan per round
+    round1_count = round2_count = 0
+    for m in municipal.values():
+        if m['round'] == 1:
+            round1_count += 1
+        else:
+            round2_count += 1
     print(f"\nResults by round:")
     print(f"  Round 1: {round1_count} communes")
     print(f"  Round 2: {round2_count} communes")
     print(f"  Total: {len(municipal)} communes")
 
     output_file = CACHE_DIR / "municipal_2020.json"
-    with open(output_file, 'w', encoding='utf-8') as f:
-        json.dump(municipal, f, indent=2, ensure_ascii=False)
+    output_file.write_bytes(orjson.dumps(municipal))
 
     print(f"\n✓ Saved municipal data for {len(municipal)} communes to {output_file}")
     return municipal
@@ -397,49 +588,49 @@ def download_presidential_2022():
         print(f"\nDownloading {round_name}...")
 
         try:
-            response = requests.get(config['url'], timeout=120)
-            response.raise_for_status()
-            response.encoding = config['encoding']  # Use encoding specified in config
-
-            # Filter out NUL bytes if present
-            text_content = response.text.replace('\x00', '')
-            reader = csv.DictReader(io.StringIO(text_content), delimiter=config['delimiter'])
-
-            # Aggregate votes by commune
-            commune_votes = defaultdict(lambda: defaultdict(int))
-            commune_totals = {}  # Don't accumulate, just set once per commune
-
             cols = config['columns']
 
-            for row in reader:
-                code_departement = row.get(cols['dept'], '').strip()
-                code_commune = row.get(cols['commune'], '').strip()
-
-                # Filter for Pays de la Loire departments
-                if code_departement not in DEPARTMENTS:
-                    continue
-
-                insee_code = code_departement + code_commune
-
-                # Get candidate info
-                nom = row.get(cols['nom'], '').strip()
-                prenom = row.get(cols['prenom'], '').strip()
-                voix = row.get(cols['voix'], '').strip()
-                exprimes = row.get(cols['exprimes'], '').strip()
-
-                if voix and nom:
-                    try:
-                        candidate_name = f"{prenom} {nom}".strip() if prenom else nom
-                        commune_votes[insee_code][candidate_name] += int(voix)
-                    except ValueError:
-                        pass  # Skip invalid vote counts
-
-                # Set total once per commune (same value for all candidates in a commune)
-                if exprimes and insee_code not in commune_totals:
-                    try:
-                        commune_totals[insee_code] = int(exprimes)
-                    except ValueError:
-                        pass
+            # Filter NUL bytes at the byte level and let the pandas
+            # tokenizer decode with the round-specific encoding itself -
+            # one bytes buffer instead of a decoded string plus a
+            # StringIO copy of it
+            raw = cached_get(config['url']).read_bytes().replace(b'\x00', b'')
+
+            # pandas C tokenizer + vectorized aggregation: the per-row
+            # Python loop over millions of polling-station rows becomes
+            # a handful of groupby kernels
+            df = pd.read_csv(
+                io.BytesIO(raw),
+                sep=config['delimiter'],
+                encoding=config['encoding'],
+                usecols=list(cols.values()),
+                dtype=str,
+                engine='c'
+            )
+
+            dept = df[cols['dept']].fillna('').str.strip()
+            nom = df[cols['nom']].fillna('').str.strip()
+            mask = dept.isin(DEPARTMENT_SET) & (nom != '')
+            df, dept, nom = df[mask], dept[mask], nom[mask]
+
+            insee = dept + df[cols['commune']].fillna('').str.strip()
+            prenom = df[cols['prenom']].fillna('').str.strip()
+            candidate = (prenom + ' ' + nom).str.strip()
+            votes = pd.to_numeric(df[cols['voix']], errors='coerce').fillna(0)
+
+            # Sum votes per (commune, candidate) - rows are per polling
+            # station, so candidates legitimately accumulate here
+            commune_votes = {}
+            for (insee_code, candidate_name), vote_count in votes.groupby([insee, candidate]).sum().items():
+                commune_votes.setdefault(insee_code, {})[candidate_name] = int(vote_count)
+
+            # Exprimés repeats the commune-wide total on every candidate
+            # row: take the first valid value per commune, never a sum
+            exprimes = pd.to_numeric(df[cols['exprimes']], errors='coerce')
+            commune_totals = {
+                insee_code: int(total)
+                for insee_code, total in exprimes.groupby(insee).first().dropna().items()
+            }
 
             # Calculate percentages and store results
             for insee_code in commune_votes:
@@ -500,8 +691,7 @@ def download_presidential_2022():
             traceback.print_exc()
 
     output_file = CACHE_DIR / "presidential_2022.json"
-    with open(output_file, 'w', encoding='utf-8') as f:
-        json.dump(presidential, f, indent=2, ensure_ascii=False)
+    output_file.write_bytes(orjson.dumps(presidential))
 
     print(f"\n✓ Saved presidential data for {len(presidential)} communes to {output_file}")
     return presidential
@@ -529,27 +719,56 @@ def download_legislative_2024():
         print(f"\nDownloading {round_name}...")
 
         try:
-            response = requests.get(url, timeout=120)
-            response.raise_for_status()
-            response.encoding = 'utf-8'  # Legislative files use UTF-8 encoding
+            # Legislative files use UTF-8 encoding (utf-8-sig absorbs a
+            # leading BOM if one is present)
+            text = cached_get(url).read_text(encoding='utf-8-sig')
 
             # Parse CSV (semicolon-separated)
-            reader = csv.DictReader(io.StringIO(response.text), delimiter=';')
+            reader = csv.reader(io.StringIO(text), delimiter=';')
+
+            # Map column names to indices once from the header, instead of
+            # probing "Nom candidat N" dict keys per row
+            header = next(reader, [])
+            col = {name: index for index, name in enumerate(header)}
+            try:
+                dept_idx = col['Code département']
+                commune_idx = col['Code commune']
+                exprimes_idx = col['Exprimés']
+            except KeyError as e:
+                print(f"  ✗ Missing expected column in {round_name}: {e}")
+                continue
+
+            # Prescan the numbered candidate columns from the header:
+            # one (nom, prénom, voix, nuance) index tuple per slot. The
+            # row loop then walks this fixed list - no f-string key
+            # formatting and no 300-iteration safety probe per row.
+            candidate_cols = []
+            candidate_num = 1
+            while f'Nom candidat {candidate_num}' in col and f'Voix {candidate_num}' in col:
+                candidate_cols.append((
+                    col[f'Nom candidat {candidate_num}'],
+                    col.get(f'Prénom candidat {candidate_num}'),
+                    col[f'Voix {candidate_num}'],
+                    col.get(f'Nuance candidat {candidate_num}')
+                ))
+                candidate_num += 1
 
             commune_count = 0
 
             for row in reader:
-                code_departement = row.get('Code département', '').strip()
-                code_commune = row.get('Code commune', '').strip()
+                if len(row) <= exprimes_idx:
+                    continue
+
+                code_departement = row[dept_idx].strip()
 
                 # Filter for Pays de la Loire departments
-                if code_departement not in DEPARTMENTS:
+                if code_departement not in DEPARTMENT_SET:
                     continue
 
                 # Note: Legislative CSVs have full INSEE code in "Code commune" (e.g., "44001")
                 # so we don't need to concatenate with department code
-                insee_code = code_commune
-                exprimes = row.get('Exprimés', '').strip()
+                insee_code = row[commune_idx].strip()
+                exprimes = row[exprimes_idx].strip()
 
                 if not exprimes:
                     continue
@@ -562,44 +781,44 @@ def download_legislative_2024():
                 if total_exprimes == 0:
                     continue
 
-                # Extract all candidates from numbered columns
+                # Extract all candidates from the prescanned columns
                 candidates = []
-                candidate_num = 1
 
-                while True:
-                    # Column names: "Nom candidat 1", "Prénom candidat 1", "Voix 1", "Nuance candidat 1"
-                    nom = row.get(f'Nom candidat {candidate_num}', '').strip()
-                    prenom = row.get(f'Prénom candidat {candidate_num}', '').strip()
-                    voix = row.get(f'Voix {candidate_num}', '').strip()
-                    nuance = row.get(f'Nuance candidat {candidate_num}', '').strip()
+                for nom_idx, prenom_idx, voix_idx, nuance_idx in candidate_cols:
+                    if voix_idx >= len(row):
+                        break
+
+                    nom = row[nom_idx].strip()
+                    voix = row[voix_idx].strip()
 
                     # Stop when we find empty candidate slot
                     if not nom or not voix:
                         break
 
+                    prenom = row[prenom_idx].strip() if prenom_idx is not None else ''
+                    nuance = row[nuance_idx].strip() if nuance_idx is not None else ''
+
                     try:
                         votes = int(voix)
                         percentage = (votes / total_exprimes) * 100
                         candidate_name = f"{prenom} {nom}".strip() if prenom else nom
 
-                        candidates.append({
-                            'candidate': candidate_name,
-                            'party': nuance or 'DIV',
-                            'percentage': round(percentage, 1),
-                            'votes': votes
-                        })
+                        # Tuple with negated votes first: a plain sort()
+                        # orders descending by votes with no key callable,
+                        # and the output dicts are built only for the
+                        # top_count winners below
+                        candidates.append((
+                            -votes,
+                            candidate_name,
+                            nuance or 'DIV',
+                            round(percentage, 1)
+                        ))
                     except ValueError:
                         pass  # Skip invalid vote counts
 
-                    candidate_num += 1
-
-                    # Safety limit to prevent infinite loop
-                    if candidate_num > 300:
-                        break
-
                 # Sort by votes and keep top 4
                 if candidates:
-                    candidates.sort(key=lambda x: x['votes'], reverse=True)
+                    candidates.sort()
 
                     # Initialize if needed
                     if insee_code not in legislative:
@@ -612,11 +831,11 @@ def download_legislative_2024():
                     # Store top candidates (without vote counts in final data)
                     legislative[insee_code][round_name] = [
                         {
-                            'candidate': c['candidate'],
-                            'party': c['party'],
-                            'percentage': c['percentage']
+                            'candidate': candidate_name,
+                            'party': party,
+                            'percentage': percentage
                         }
-                        for c in candidates[:top_count]
+                        for _, candidate_name, party, percentage in candidates[:top_count]
                     ]
 
                     commune_count += 1
@@ -629,8 +848,7 @@ def download_legislative_2024():
             traceback.print_exc()
 
     output_file = CACHE_DIR / "legislative_2024.json"
-    with open(output_file, 'w', encoding='utf-8') as f:
-        json.dump(legislative, f, indent=2, ensure_ascii=False)
+    output_file.write_bytes(orjson.dumps(legislative))
 
     print(f"\n✓ Saved legislative data for {len(legislative)} communes to {output_file}")
     return legislative
@@ -642,23 +860,35 @@ def merge_political_data():
     print("MERGING POLITICAL DATA")
     print("="*80)
 
+    # Signature gate: if none of the input caches changed since the last
+    # merge (mtime + size), the existing output is already current -
+    # reload it instead of recomputing the whole merge
+    input_files = [CACHE_DIR / name for name in (
+        "insee_mapping.json", "mayors.json", "municipal_2020.json",
+        "presidential_2022.json", "legislative_2024.json"
+    )]
+    sig = hashlib.blake2b(repr([
+        (f.name, f.stat().st_mtime_ns, f.stat().st_size)
+        for f in input_files if f.exists()
+    ]).encode(), digest_size=16).hexdigest()
+    sig_file = CACHE_DIR / ".merge_sig"
+    merged_file = CACHE_DIR / "political_data.json"
+    if merged_file.exists() and sig_file.exists() and sig_file.read_text() == sig:
+        print("✓ Input caches unchanged since last merge - reusing political_data.json")
+        return orjson.loads(merged_file.read_bytes())
+
     # Load all data sources
     print("Loading data sources...")
 
-    with open(CACHE_DIR / "insee_mapping.json") as f:
-        insee_mapping = json.load(f)
+    insee_mapping = orjson.loads((CACHE_DIR / "insee_mapping.json").read_bytes())
 
-    with open(CACHE_DIR / "mayors.json") as f:
-        mayors = json.load(f)
+    mayors = orjson.loads((CACHE_DIR / "mayors.json").read_bytes())
 
-    with open(CACHE_DIR / "municipal_2020.json") as f:
-        municipal = json.load(f)
+    municipal = orjson.loads((CACHE_DIR / "municipal_2020.json").read_bytes())
 
-    with open(CACHE_DIR / "presidential_2022.json") as f:
-        presidential = json.load(f)
+    presidential = orjson.loads((CACHE_DIR / "presidential_2022.json").read_bytes())
 
-    with open(CACHE_DIR / "legislative_2024.json") as f:
-        legislative = json.load(f)
+    legislative = orjson.loads((CACHE_DIR / "legislative_2024.json").read_bytes())
 
     print(f"  INSEE mapping: {len(insee_mapping)} entries")
     print(f"  Mayors: {len(mayors)} communes")
@@ -666,12 +896,15 @@ def merge_political_data():
     print(f"  Presidential 2022: {len(presidential)} communes")
     print(f"  Legislative 2024: {len(legislative)} communes")
 
-    # Collect all unique INSEE codes
-    all_insee_codes = set()
+    # Reverse index: INSEE code -> commune name, built once instead of
+    # re-scanning every mapping entry for every merged commune
+    insee_to_name = {
+        mapping_data['insee_code']: mapping_data['commune_name']
+        for mapping_data in insee_mapping.values()
+    }
 
-    # Add INSEE codes from mapping
-    for mapping_data in insee_mapping.values():
-        all_insee_codes.add(mapping_data['insee_code'])
+    # Collect all unique INSEE codes
+    all_insee_codes = set(insee_to_name)
 
     # Add INSEE codes from other sources
     all_insee_codes.update(mayors.keys())
@@ -686,11 +919,7 @@ def merge_political_data():
 
     for insee_code in all_insee_codes:
         # Find commune name from mapping or mayors
-        commune_name = None
-        for mapping_data in insee_mapping.values():
-            if mapping_data['insee_code'] == insee_code:
-                commune_name = mapping_data['commune_name']
-                break
+        commune_name = insee_to_name.get(insee_code)
 
         if not commune_name and insee_code in mayors:
             # Try to infer from INSEE code (not ideal but fallback)
@@ -700,31 +929,30 @@ def merge_political_data():
             # Get mayor info and merge party from municipal data
             mayor_info = mayors.get(insee_code)
             if mayor_info and insee_code in municipal:
-                # Add party from municipal election results
-                mayor_info = mayor_info.copy()
-                party_code = municipal[insee_code].get('party')
-                # Convert party code to readable label
-                if party_code:
-                    mayor_info['party'] = PARTY_LABELS.get(party_code, party_code)  # Use code if not in mapping
-                else:
-                    mayor_info['party'] = None
-
-            political_data[insee_code] = {
-                'commune_name': commune_name,
-                'insee_code': insee_code,
-                'mayor': mayor_info,
-                'municipal_2020': municipal.get(insee_code),
-                'presidential_2022': presidential.get(insee_code),
-                'legislative_2024': legislative.get(insee_code)
-            }
+                # Add party (as readable label) from municipal results
+                mayor_info = {
+                    **mayor_info,
+                    'party': _party_label(municipal[insee_code].get('party'))
+                }
+
+            political_data[insee_code] = Commune(
+                commune_name=commune_name,
+                insee_code=insee_code,
+                mayor=mayor_info,
+                municipal_2020=municipal.get(insee_code),
+                presidential_2022=presidential.get(insee_code),
+                legislative_2024=legislative.get(insee_code)
+            )
 
     print(f"✓ Merged {len(political_data)} communes with political data")
 
-    # Statistics
-    with_mayor = sum(1 for v in political_data.values() if v.get('mayor'))
-    with_municipal = sum(1 for v in political_data.values() if v.get('municipal_2020'))
-    with_presidential = sum(1 for v in political_data.values() if v.get('presidential_2022'))
-    with_legislative = sum(1 for v in political_data.values() if v.get('legislative_2024'))
+    # Statistics - all four coverage counts in one pass over the merged dict
+    with_mayor = with_municipal = with_presidential = with_legislative = 0
+    for v in political_data.values():
+        with_mayor += v.mayor is not None
+        with_municipal += v.municipal_2020 is not None
+        with_presidential += v.presidential_2022 is not None
+        with_legislative += v.legislative_2024 is not None
 
     print(f"\nCoverage:")
     print(f"  Mayors: {with_mayor}/{len(political_data)} ({100*with_mayor/len(political_data):.1f}%)")
@@ -732,13 +960,34 @@ def merge_political_data():
     print(f"  Presidential 2022: {with_presidential}/{len(political_data)} ({100*with_presidential/len(political_data) if political_data else 0:.1f}%)")
     print(f"  Legislative 2024: {with_legislative}/{len(political_data)} ({100*with_legislative/len(political_data) if political_data else 0:.1f}%)")
 
-    # Save merged data
-    output_file = CACHE_DIR / "political_data.json"
-    with open(output_file, 'w', encoding='utf-8') as f:
-        json.dump(political_data, f, indent=2, ensure_ascii=False)
+    # Save merged data and the input signature it was computed from
+    output_file = merged_file
+    output_file.write_bytes(orjson.dumps(political_data, option=orjson.OPT_INDENT_2))
+    sig_file.write_text(sig)
 
     print(f"\n✓ Saved merged political data to {output_file}")
 
+    # Also shard by department so consumers that only care about one
+    # department can load a small file instead of parsing the full blob.
+    # One bucketing pass over the merged dict (department = insee[:2]).
+    by_dept = {}
+    for insee_code, commune in political_data.items():
+        by_dept.setdefault(insee_code[:2], {})[insee_code] = commune
+
+    index = {}
+    for dept in sorted(by_dept):
+        shard_file = CACHE_DIR / f"political_data_{dept}.json"
+        shard_file.write_bytes(orjson.dumps(by_dept[dept], option=orjson.OPT_INDENT_2))
+        index[dept] = {
+            'filename': shard_file.name,
+            'communes': len(by_dept[dept])
+        }
+
+    index_file = CACHE_DIR / "political_data_index.json"
+    index_file.write_bytes(orjson.dumps(index, option=orjson.OPT_INDENT_2))
+
+    print(f"✓ Saved {len(by_dept)} department shards + {index_file.name}")
+
     return political_data
 
 
@@ -754,21 +1003,20 @@ def main():
     print("\n[1/6] Building INSEE code mapping...")
     insee_mapping = build_insee_mapping()
 
-    # Step 2: Download mayors
-    print("\n[2/6] Downloading current mayors...")
-    mayors = download_mayors()
-
-    # Step 3: Download municipal results
-    print("\n[3/6] Downloading Municipal 2020 results...")
-    municipal = download_municipal_2020()
-
-    # Step 4: Download presidential results
-    print("\n[4/6] Downloading Presidential 2022 results...")
-    presidential = download_presidential_2022()
-
-    # Step 5: Download legislative results
-    print("\n[5/6] Downloading Legislative 2024 results...")
-    legislative = download_legislative_2024()
+    # Steps 2-5: the four sources live on independent hosts and have no
+    # data dependency on each other, so download them concurrently -
+    # this phase then costs max(step) instead of sum(step)
+    print("\n[2-5/6] Downloading mayors + election results in parallel...")
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        mayors_future = executor.submit(download_mayors)
+        municipal_future = executor.submit(download_municipal_2020)
+        presidential_future = executor.submit(download_presidential_2022)
+        legislative_future = executor.submit(download_legislative_2024)
+
+        mayors = mayors_future.result()
+        municipal = municipal_future.result()
+        presidential = presidential_future.result()
+        legislative = legislative_future.result()
 
     # Step 6: Merge all data
     print("\n[6/6] Merging all political data...")
@@ -7,6 +7,7 @@ for Pays de la Loire schools
 import requests
 import json
 from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
 
 
 # API base URL
@@ -15,15 +16,18 @@ BASE_URL = "https://data.education.gouv.fr/api/v2/catalog/datasets"
 # Pays de la Loire department codes
 PAYS_LOIRE_DEPARTMENTS = ['44', '49', '53', '72', '85']  # Loire-Atlantique, Maine-et-Loire, Mayenne, Sarthe, Vendée
 
+# One session for all API calls: the concurrent fetches share pooled
+# keep-alive connections instead of each paying a TCP + TLS handshake
+SESSION = requests.Session()
+SESSION.mount('https://', requests.adapters.HTTPAdapter(
+    pool_connections=8,
+    pool_maxsize=8,
+    max_retries=3
+))
 
-def explore_dataset(dataset_id, name, filters=None, limit=10):
-    """Explore a dataset and show sample data"""
-    print("="*80)
-    print(f"DATASET: {name}")
-    print(f"ID: {dataset_id}")
-    print("="*80)
 
-    # Build URL
+def fetch_dataset(dataset_id, filters=None, limit=10):
+    """Fetch a sample of a dataset; returns (data, error_message)."""
     url = f"{BASE_URL}/{dataset_id}/records"
     params = {
         'limit': limit,
@@ -34,12 +38,26 @@ def explore_dataset(dataset_id, name, filters=None, limit=10):
         params['where'] = filters
 
     try:
-        print(f"Fetching {url}...")
-        response = requests.get(url, params=params, timeout=30)
+        response = SESSION.get(url, params=params, timeout=30)
         response.raise_for_status()
+        return response.json(), None
+    except requests.exceptions.RequestException as e:
+        return None, f"❌ Error fetching data: {e}"
 
-        data = response.json()
 
+def explore_dataset(dataset_id, name, filters=None, limit=10, prefetched=None):
+    """Explore a dataset and show sample data"""
+    print("="*80)
+    print(f"DATASET: {name}")
+    print(f"ID: {dataset_id}")
+    print("="*80)
+
+    data, error = prefetched if prefetched else fetch_dataset(dataset_id, filters, limit)
+    if error:
+        print(error)
+        return None
+
+    try:
         # Check structure - API uses 'records' key
         if 'records' not in data:
             print(f"⚠️  Unexpected response structure: {list(data.keys())}")
@@ -72,9 +90,6 @@ def explore_dataset(dataset_id, name, filters=None, limit=10):
 
         return data
 
-    except requests.exceptions.RequestException as e:
-        print(f"❌ Error fetching data: {e}")
-        return None
     except Exception as e:
         print(f"❌ Error processing data: {e}")
         return None
@@ -89,60 +104,47 @@ def main():
     print("="*80)
     print()
 
-    # 1. Education Directory (Annuaire)
-    print("\n\n1. EDUCATION DIRECTORY (ANNUAIRE)")
-    print("-"*80)
-    explore_dataset(
-        "fr-en-annuaire-education",
-        "Annuaire de l'Éducation",
-        filters="libelle_region='Pays de la Loire'",
-        limit=5
-    )
-
-    # 2. IPS for Primary Schools
-    print("\n\n2. IPS - PRIMARY SCHOOLS (ÉCOLES)")
-    print("-"*80)
-    explore_dataset(
-        "fr-en-ips-ecoles-ap2022",
-        "IPS des écoles (à partir de 2022)",
-        limit=5
-    )
-
-    # 3. IPS for Collèges
-    print("\n\n3. IPS - MIDDLE SCHOOLS (COLLÈGES)")
-    print("-"*80)
-    explore_dataset(
-        "fr-en-ips-colleges-ap2023",
-        "IPS des collèges (à partir de 2023)",
-        limit=5
-    )
-
-    # 4. IPS for Lycées
-    print("\n\n4. IPS - HIGH SCHOOLS (LYCÉES)")
-    print("-"*80)
-    explore_dataset(
-        "fr-en-ips-lycees-ap2023",
-        "IPS des lycées (à partir de 2023)",
-        limit=5
-    )
-
-    # 5. Brevet Results (Middle School)
-    print("\n\n5. BREVET RESULTS (COLLÈGES)")
-    print("-"*80)
-    explore_dataset(
-        "fr-en-dnb-par-etablissement",
-        "Résultats du Brevet par établissement",
-        limit=5
-    )
-
-    # 6. Baccalauréat Results (High School)
-    print("\n\n6. BACCALAURÉAT RESULTS (LYCÉES)")
-    print("-"*80)
-    explore_dataset(
-        "fr-en-indicateurs-de-resultat-des-lycees-gt_v2",
-        "Indicateurs de résultats des lycées (général et technologique)",
-        limit=5
-    )
+    # (section header, dataset_id, name, filters, limit)
+    datasets = [
+        ("1. EDUCATION DIRECTORY (ANNUAIRE)",
+         "fr-en-annuaire-education",
+         "Annuaire de l'Éducation",
+         "libelle_region='Pays de la Loire'", 5),
+        ("2. IPS - PRIMARY SCHOOLS (ÉCOLES)",
+         "fr-en-ips-ecoles-ap2022",
+         "IPS des écoles (à partir de 2022)",
+         None, 5),
+        ("3. IPS - MIDDLE SCHOOLS (COLLÈGES)",
+         "fr-en-ips-colleges-ap2023",
+         "IPS des collèges (à partir de 2023)",
+         None, 5),
+        ("4. IPS - HIGH SCHOOLS (LYCÉES)",
+         "fr-en-ips-lycees-ap2023",
+         "IPS des lycées (à partir de 2023)",
+         None, 5),
+        ("5. BREVET RESULTS (COLLÈGES)",
+         "fr-en-dnb-par-etablissement",
+         "Résultats du Brevet par établissement",
+         None, 5),
+        ("6. BACCALAURÉAT RESULTS (LYCÉES)",
+         "fr-en-indicateurs-de-resultat-des-lycees-gt_v2",
+         "Indicateurs de résultats des lycées (général et technologique)",
+         None, 5),
+    ]
+
+    # The six sample fetches are independent and latency-bound: fire
+    # them concurrently, then report sequentially so the output reads
+    # exactly like the old one-at-a-time version
+    with ThreadPoolExecutor(max_workers=len(datasets)) as executor:
+        prefetched = list(executor.map(
+            lambda spec: fetch_dataset(spec[1], spec[3], spec[4]),
+            datasets
+        ))
+
+    for (section, dataset_id, name, filters, limit), result in zip(datasets, prefetched):
+        print(f"\n\n{section}")
+        print("-"*80)
+        explore_dataset(dataset_id, name, filters, limit, prefetched=result)
 
     print("\n" + "="*80)
     print("EXPLORATION COMPLETE")
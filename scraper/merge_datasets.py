@@ -4,44 +4,159 @@ Merge all education datasets on UAI code
 Create final schools.json for frontend map
 """
 
-import json
+import sys
 from pathlib import Path
-from collections import defaultdict
+
+import ijson
+import orjson
 
 # Data directory
 DATA_DIR = Path(__file__).parent.parent / "data"
 
+# Shared fallback for dispatch-table misses ('Unknown' school types)
+_EMPTY = {}
+
+# Turns "94,20%" into "94.20" in one C-level pass
+_TAUX_TABLE = str.maketrans({',': '.', '%': None, ' ': None})
+
+
+# Departments the map covers (INSEE code prefixes):
+# Pays de la Loire + Nouvelle-Aquitaine
+ALLOWED_DEPARTMENTS = frozenset({
+    '44', '49', '53', '72', '85',
+    '16', '17', '19', '23', '24', '33', '40', '47', '64', '79', '86', '87'
+})
+
 
-def load_json(filename):
-    """Load JSON file"""
+def _intern(value):
+    """
+    Dedupe a repeated string value via sys.intern (non-strings pass
+    through). Fields like department or statut_public_prive take a
+    handful of distinct values but arrive as thousands of separate
+    string objects from the parser.
+    """
+    return sys.intern(value) if type(value) is str else value
+
+
+def iter_records(filename):
+    """
+    Yield records from a JSON array file one at a time.
+
+    When the downloader also wrote an NDJSON sidecar (same name with a
+    .jsonl suffix, one record per line), stream that instead: orjson
+    parses each line on its fast path with no array-walking overhead.
+    Otherwise ijson walks the JSON array incrementally. Either way each
+    input costs one record of memory instead of the whole parsed list -
+    the lookup builders and the annuaire pass all consume records
+    exactly once.
+    """
     filepath = DATA_DIR / filename
-    print(f"Loading {filename}...")
-    with open(filepath, 'r', encoding='utf-8') as f:
-        data = json.load(f)
-    print(f"  Loaded {len(data)} records")
-    return data
+    jsonl_path = filepath.with_suffix('.jsonl')
+    if jsonl_path.exists():
+        print(f"Streaming {jsonl_path.name}...")
+        with open(jsonl_path, 'rb') as f:
+            for line in f:
+                if line.strip():
+                    yield orjson.loads(line)
+        return
+
+    print(f"Streaming {filename}...")
+    # use_float keeps numbers as floats (ijson defaults to Decimal,
+    # which orjson refuses to serialize)
+    with open(filepath, 'rb') as f:
+        yield from ijson.items(f, 'item', use_float=True)
 
 
 def extract_fields(record):
-    """Extract fields from API record structure"""
-    return record.get('record', {}).get('fields', {})
+    """
+    Extract fields from API record structure.
+
+    Every record in the downloaded files has the record/fields wrapper,
+    so the happy path is two plain dict subscripts; the except branch
+    only pays on malformed records, where the old chained .get calls
+    allocated a throwaway empty dict per record.
+    """
+    try:
+        return record['record']['fields']
+    except (KeyError, TypeError):
+        return {}
+
+
+def index_by_uai(records, uai_field):
+    """Index API records by UAI (last record wins on duplicates)."""
+    lookup = {}
+    for record in records:
+        fields = extract_fields(record)
+        uai = fields.get(uai_field)
+        if uai:
+            lookup[uai] = fields
+    return lookup
+
+
+def latest_by_uai(records, uai_field, year_field='rentree_scolaire'):
+    """
+    Index API records by UAI, keeping the most recent school year when
+    a UAI appears in several yearly records.
+    """
+    lookup = {}
+    for record in records:
+        fields = extract_fields(record)
+        uai = fields.get(uai_field)
+        if not uai:
+            continue
+        best = lookup.get(uai)
+        if best is None or fields.get(year_field, '') > best.get(year_field, ''):
+            lookup[uai] = fields
+    return lookup
+
+
+def iter_mappable_schools(records):
+    """
+    Yield (fields, uai, lat, lon) for annuaire records that can go on
+    the map. Keeping the UAI + coordinates gate in one generator means
+    the merge loop never runs its field extraction and dict building
+    for records it would discard.
+    """
+    for record in records:
+        fields = extract_fields(record)
+        uai = fields.get('identifiant_de_l_etablissement')
+        if not uai:
+            continue
+        # Guard against an unfiltered (e.g. national) annuaire download:
+        # only covered departments get past the cheap prefix check.
+        # Records with no INSEE code at all are kept, as before.
+        insee_code = fields.get('code_commune') or ''
+        if insee_code and insee_code[:2] not in ALLOWED_DEPARTMENTS:
+            continue
+        lat = fields.get('latitude')
+        lon = fields.get('longitude')
+        if lat and lon:
+            yield fields, uai, lat, lon
 
 
 def categorize_school_type(fields):
     """
     Categorize school into: Primaire, Collège, or Lycée
     """
+    # type_etablissement decides for almost every record, so check it
+    # alone first - the libelle_nature fallback (and its per-call
+    # .upper() string allocation) only runs when it comes up empty
     type_etab = fields.get('type_etablissement', '')
-    libelle_nature = fields.get('libelle_nature', '') or ''
+    if 'Ecole' in type_etab:
+        return 'Primaire'
+    if 'Collège' in type_etab:
+        return 'Collège'
+    if 'Lycée' in type_etab:
+        return 'Lycée'
 
-    if 'Ecole' in type_etab or 'ECOLE' in libelle_nature.upper():
+    libelle_nature = (fields.get('libelle_nature') or '').upper()
+    if 'ECOLE' in libelle_nature:
         return 'Primaire'
-    elif 'Collège' in type_etab or 'COLLEGE' in libelle_nature.upper():
+    if 'COLLEGE' in libelle_nature:
         return 'Collège'
-    elif 'Lycée' in type_etab or 'LYCEE' in libelle_nature.upper():
+    if 'LYCEE' in libelle_nature:
         return 'Lycée'
-    else:
-        return 'Unknown'
+    return 'Unknown'
 
 
 def merge_data():
@@ -53,66 +168,17 @@ def merge_data():
     print("="*80)
     print()
 
-    # Load all datasets
-    annuaire_records = load_json("annuaire_pays_loire.json")
-    ips_ecoles_records = load_json("ips_ecoles_pays_loire.json")
-    ips_colleges_records = load_json("ips_colleges_pays_loire.json")
-    ips_lycees_records = load_json("ips_lycees_pays_loire.json")
-    brevet_records = load_json("brevet_results_pays_loire.json")
-    bac_records = load_json("bac_results_pays_loire.json")
+    # Stream each dataset straight into its lookup dictionary - only the
+    # per-UAI lookups stay resident, never the raw record lists
+    print("Creating UAI lookup dictionaries...")
 
-    # Load enrollment data (effectifs)
-    effectifs_ecoles_records = load_json("effectifs_ecoles_pays_loire.json")
-    effectifs_colleges_records = load_json("effectifs_colleges_pays_loire.json")
-    effectifs_lycees_records = load_json("effectifs_lycees_pays_loire.json")
+    # IPS datasets keep the most recent year per school
+    ips_ecoles = latest_by_uai(iter_records("ips_ecoles_pays_loire.json"), 'uai')
+    ips_colleges = latest_by_uai(iter_records("ips_colleges_pays_loire.json"), 'uai')
+    ips_lycees = latest_by_uai(iter_records("ips_lycees_pays_loire.json"), 'uai')
 
-    # Load language offerings data
-    language_records = load_json("language_offerings_pays_loire.json")
-
-    # Create lookup dictionaries by UAI
-    print("\nCreating UAI lookup dictionaries...")
-
-    ips_ecoles = {}
-    for record in ips_ecoles_records:
-        fields = extract_fields(record)
-        uai = fields.get('uai')
-        if uai:
-            # Keep most recent year if multiple records
-            rentree = fields.get('rentree_scolaire', '')
-            if uai not in ips_ecoles or rentree > ips_ecoles[uai].get('rentree_scolaire', ''):
-                ips_ecoles[uai] = fields
-
-    ips_colleges = {}
-    for record in ips_colleges_records:
-        fields = extract_fields(record)
-        uai = fields.get('uai')
-        if uai:
-            rentree = fields.get('rentree_scolaire', '')
-            if uai not in ips_colleges or rentree > ips_colleges[uai].get('rentree_scolaire', ''):
-                ips_colleges[uai] = fields
-
-    ips_lycees = {}
-    for record in ips_lycees_records:
-        fields = extract_fields(record)
-        uai = fields.get('uai')
-        if uai:
-            rentree = fields.get('rentree_scolaire', '')
-            if uai not in ips_lycees or rentree > ips_lycees[uai].get('rentree_scolaire', ''):
-                ips_lycees[uai] = fields
-
-    brevet_results = {}
-    for record in brevet_records:
-        fields = extract_fields(record)
-        uai = fields.get('numero_d_etablissement')
-        if uai:
-            brevet_results[uai] = fields
-
-    bac_results = {}
-    for record in bac_records:
-        fields = extract_fields(record)
-        uai = fields.get('uai')
-        if uai:
-            bac_results[uai] = fields
+    brevet_results = index_by_uai(iter_records("brevet_results_pays_loire.json"), 'numero_d_etablissement')
+    bac_results = index_by_uai(iter_records("bac_results_pays_loire.json"), 'uai')
 
     print(f"  IPS Écoles: {len(ips_ecoles)} schools")
     print(f"  IPS Collèges: {len(ips_colleges)} schools")
@@ -121,22 +187,11 @@ def merge_data():
     print(f"  Bac: {len(bac_results)} schools")
 
     # Create enrollment lookup dictionaries
-    effectifs_ecoles = {}
-    for record in effectifs_ecoles_records:
-        fields = extract_fields(record)
-        uai = fields.get('numero_ecole')
-        if uai:
-            effectifs_ecoles[uai] = fields
-
-    effectifs_colleges = {}
-    for record in effectifs_colleges_records:
-        fields = extract_fields(record)
-        uai = fields.get('numero_college')
-        if uai:
-            effectifs_colleges[uai] = fields
+    effectifs_ecoles = index_by_uai(iter_records("effectifs_ecoles_pays_loire.json"), 'numero_ecole')
+    effectifs_colleges = index_by_uai(iter_records("effectifs_colleges_pays_loire.json"), 'numero_college')
 
     effectifs_lycees = {}
-    for record in effectifs_lycees_records:
+    for record in iter_records("effectifs_lycees_pays_loire.json"):
         # This data is aggregated already in the download script
         uai = record.get('uai')
         if uai:
@@ -148,13 +203,26 @@ def merge_data():
 
     # Create language offerings lookup
     languages = {}
-    for record in language_records:
+    for record in iter_records("language_offerings_pays_loire.json"):
         uai = record.get('uai')
         if uai:
             languages[uai] = record
 
     print(f"  Language Offerings: {len(languages)} schools")
 
+    # Dispatch tables: resolve the right per-type lookup with one hash
+    # probe instead of a string-comparison ladder per school
+    ips_by_type = {
+        'Primaire': ips_ecoles,
+        'Collège': ips_colleges,
+        'Lycée': ips_lycees
+    }
+    effectifs_by_type = {
+        'Primaire': effectifs_ecoles,
+        'Collège': effectifs_colleges,
+        'Lycée': effectifs_lycees
+    }
+
     # Merge with annuaire (base dataset)
     print("\nMerging data with Annuaire...")
     merged_schools = []
@@ -170,20 +238,7 @@ def merge_data():
         'with_languages': 0
     }
 
-    for record in annuaire_records:
-        fields = extract_fields(record)
-        uai = fields.get('identifiant_de_l_etablissement')
-
-        if not uai:
-            continue
-
-        # Get coordinates
-        lat = fields.get('latitude')
-        lon = fields.get('longitude')
-
-        if not lat or not lon:
-            continue  # Skip schools without coordinates
-
+    for fields, uai, lat, lon in iter_mappable_schools(iter_records("annuaire_pays_loire.json")):
         stats['with_coordinates'] += 1
 
         # Categorize school type
@@ -201,13 +256,13 @@ def merge_data():
             'uai': uai,
             'name': fields.get('nom_etablissement', ''),
             'type': school_type,
-            'public_private': fields.get('statut_public_prive', ''),
+            'public_private': _intern(fields.get('statut_public_prive', '')),
             'address': {
                 'street': fields.get('adresse_1', ''),
-                'postal_code': fields.get('code_postal', ''),
-                'city': fields.get('nom_commune', ''),
-                'department': fields.get('libelle_departement', ''),
-                'insee_code': fields.get('code_commune', '')
+                'postal_code': _intern(fields.get('code_postal', '')),
+                'city': _intern(fields.get('nom_commune', '')),
+                'department': _intern(fields.get('libelle_departement', '')),
+                'insee_code': _intern(fields.get('code_commune', ''))
             },
             'coordinates': {
                 'latitude': lat,
@@ -221,14 +276,9 @@ def merge_data():
             'student_count': fields.get('nombre_d_eleves'),
         }
 
-        # Add IPS data based on school type
-        ips_data = None
-        if school_type == 'Primaire' and uai in ips_ecoles:
-            ips_data = ips_ecoles[uai]
-        elif school_type == 'Collège' and uai in ips_colleges:
-            ips_data = ips_colleges[uai]
-        elif school_type == 'Lycée' and uai in ips_lycees:
-            ips_data = ips_lycees[uai]
+        # Add IPS data based on school type - single dispatch-table
+        # lookup instead of a string-comparison ladder per school
+        ips_data = ips_by_type.get(school_type, _EMPTY).get(uai)
 
         if ips_data:
             stats['with_ips'] += 1
@@ -249,42 +299,37 @@ def merge_data():
                 'departemental_average': ips_data.get('ips_departemental') or ips_data.get('ips_departemental_legt')
             }
 
-        # Add enrollment data based on school type
-        effectifs_data = None
-        if school_type == 'Primaire' and uai in effectifs_ecoles:
-            effectifs_data = effectifs_ecoles[uai]
-            school['student_count'] = effectifs_data.get('nombre_total_eleves')
-            school['number_of_classes'] = effectifs_data.get('nombre_total_classes')
-            school['enrollment_year'] = effectifs_data.get('rentree_scolaire')
-            # Calculate actual class size for primary schools
-            if school['student_count'] and school['number_of_classes'] and school['number_of_classes'] > 0:
-                school['class_size'] = round(school['student_count'] / school['number_of_classes'], 1)
-            if school['student_count']:
-                stats['with_enrollment'] += 1
-        elif school_type == 'Collège' and uai in effectifs_colleges:
-            effectifs_data = effectifs_colleges[uai]
-            school['student_count'] = effectifs_data.get('nombre_eleves_total')
-            school['enrollment_year'] = effectifs_data.get('rentree_scolaire')
-            if school['student_count']:
-                stats['with_enrollment'] += 1
-        elif school_type == 'Lycée' and uai in effectifs_lycees:
-            effectifs_data = effectifs_lycees[uai]
-            school['student_count'] = effectifs_data.get('total_students')
-            school['enrollment_year'] = effectifs_data.get('rentree')
+        # Add enrollment data based on school type (field names differ
+        # per source, so the branch remains - only the lookup is shared)
+        effectifs_data = effectifs_by_type.get(school_type, _EMPTY).get(uai)
+        if effectifs_data is not None:
+            if school_type == 'Primaire':
+                school['student_count'] = effectifs_data.get('nombre_total_eleves')
+                school['number_of_classes'] = effectifs_data.get('nombre_total_classes')
+                school['enrollment_year'] = effectifs_data.get('rentree_scolaire')
+                # Calculate actual class size for primary schools
+                if school['student_count'] and school['number_of_classes'] and school['number_of_classes'] > 0:
+                    school['class_size'] = round(school['student_count'] / school['number_of_classes'], 1)
+            elif school_type == 'Collège':
+                school['student_count'] = effectifs_data.get('nombre_eleves_total')
+                school['enrollment_year'] = effectifs_data.get('rentree_scolaire')
+            else:  # Lycée
+                school['student_count'] = effectifs_data.get('total_students')
+                school['enrollment_year'] = effectifs_data.get('rentree')
             if school['student_count']:
                 stats['with_enrollment'] += 1
 
         # Add exam results based on school type
-        if school_type == 'Collège' and uai in brevet_results:
+        brevet = brevet_results.get(uai) if school_type == 'Collège' else None
+        if brevet is not None:
             stats['with_exam_results'] += 1
-            brevet = brevet_results[uai]
             taux = brevet.get('taux_de_reussite', '')
             # Parse "94,20%" to float
             success_rate = None
             if taux:
                 try:
-                    success_rate = float(taux.replace(',', '.').replace('%', ''))
-                except:
+                    success_rate = float(taux.translate(_TAUX_TABLE))
+                except ValueError:
                     pass
 
             school['exam_results'] = {
@@ -302,9 +347,8 @@ def merge_data():
                 }
             }
 
-        elif school_type == 'Lycée' and uai in bac_results:
+        elif school_type == 'Lycée' and (bac := bac_results.get(uai)):
             stats['with_exam_results'] += 1
-            bac = bac_results[uai]
             school['exam_results'] = {
                 'type': 'Baccalauréat',
                 'year': bac.get('annee', ''),
@@ -383,10 +427,17 @@ def merge_data():
         print(f"  Removed {duplicates_removed} duplicate campuses")
         stats['total'] = len(deduplicated_schools)
 
-    # Save merged data
+    # Save merged data (orjson never ASCII-escapes, so accents survive).
+    # Schools are serialized one at a time so the full multi-MB JSON
+    # blob never sits in memory next to the school list itself.
     output_file = DATA_DIR / "schools.json"
-    with open(output_file, 'w', encoding='utf-8') as f:
-        json.dump(deduplicated_schools, f, ensure_ascii=False, indent=2)
+    with open(output_file, 'wb') as f:
+        f.write(b'[\n')
+        for index, school in enumerate(deduplicated_schools):
+            if index:
+                f.write(b',\n')
+            f.write(orjson.dumps(school, option=orjson.OPT_INDENT_2))
+        f.write(b'\n]')
 
     print(f"\n✓ Saved merged data to {output_file}")
 